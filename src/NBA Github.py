@@ -1,16 +1,36 @@
 # collect.py
 import os
 import re
+import csv
+import argparse
 import time
 import json
+import random
+import functools
+import unicodedata
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import numpy as np
 import pandas as pd
-from difflib import get_close_matches
-from requests.exceptions import ReadTimeout
+import requests_cache
+from rapidfuzz import process, fuzz
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, ReadTimeout, RetryError
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # Fallback auf die Standardbibliothek
+    orjson = None
 
 from nba_api.stats.static import players as static_players
-from nba_api.stats.endpoints import playergamelog, commonplayerinfo
+from nba_api.stats.endpoints import playergamelog, commonplayerinfo, commonallplayers
+from nba_api.stats.library.http import NBAStatsHTTP
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill
 from openpyxl.formatting.rule import FormulaRule
 from openpyxl.utils import get_column_letter
@@ -23,14 +43,23 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 input_datei = os.path.join(BASE_DIR, "PlayerNames.csv")
 output_xlsx = os.path.join(BASE_DIR, "TeamStatistiken_Meilensteine.xlsx")
 not_found_csv = os.path.join(BASE_DIR, "not_found_names.csv")
+http_cache = os.path.join(BASE_DIR, "nba_cache")  # sqlite, wird als nba_cache.sqlite angelegt
 
 # =========================
 # Parameter
 # =========================
 SEASON = "2025-26"
 LAST_N = 8
-SLEEP_BETWEEN_CALLS = 0.10
+MAX_WORKERS = 6
+REQUESTS_PER_SECOND = 4  # gilt für alle Worker zusammen
 LOG_LEVEL = 0  # 0=still, 1=warn, 2=info
+RUNNING_IN_CI = os.getenv("GITHUB_ACTIONS", "false") == "true"
+
+# Excel nur bauen, wenn gewünscht: lokal standardmäßig an, in CI reicht das JSON
+_parser = argparse.ArgumentParser(description="NBA-Meilensteine je Team als Excel und JSON")
+_parser.add_argument("--xlsx", action=argparse.BooleanOptionalAction, default=not RUNNING_IN_CI,
+                     help="Excel-Datei schreiben (Standard: lokal ja, in GitHub Actions nein)")
+EMIT_XLSX = _parser.parse_known_args()[0].xlsx
 
 # =========================
 # Wenn CSV fehlt → automatisch erzeugen
@@ -57,38 +86,109 @@ def log_error(msg):
     print(msg)
 
 # =========================
-# Retry
+# HTTP-Cache + Rate-Limit + Retry
 # =========================
-def retry_api_call(callable_fn, retries=3, delay=5, on_timeout_msg=None):
+# Gamelogs wachsen nur an, Team-Infos ändern sich nur bei Trades
+requests_cache.install_cache(
+    http_cache,
+    backend="sqlite",
+    expire_after=timedelta(hours=1),
+    urls_expire_after={
+        "stats.nba.com/stats/playergamelog": timedelta(hours=6),
+        "stats.nba.com/stats/commonplayerinfo": timedelta(days=1),
+        "stats.nba.com/stats/commonallplayers": timedelta(days=1),
+    },
+)
+
+_rate_lock = threading.Lock()
+_next_call_at = 0.0
+_congestion_delay = 0.0  # globaler Zuschlag je Anfrage: wächst bei Überlast, klingt bei Erfolg ab
+
+def _throttle(response, *args, **kwargs):
+    # Token-Bucket mit Größe 1 über alle Threads; Cache-Treffer zählen nicht.
+    # requests-cache ruft Response-Hooks bei echten Anfragen zweimal auf -> nur einmal zählen
+    global _next_call_at
+    if getattr(response, "from_cache", False) or getattr(response, "_throttled", False):
+        return response
+    response._throttled = True
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_call_at - now
+        _next_call_at = max(now, _next_call_at) + 1.0 / REQUESTS_PER_SECOND + _congestion_delay
+    if wait > 0:
+        time.sleep(wait)
+    return response
+
+# eine gemeinsame Session für alle Endpoints: Keep-Alive, Pool für alle Worker, Retry bei 429/5xx
+# nur Status-Retries im Adapter: Timeouts/Verbindungsfehler gehen direkt an retry_api_call
+# (read=False -> ReadTimeout statt ConnectionError, sonst multiplizieren sich beide Retry-Ebenen)
+_session = NBAStatsHTTP.get_session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, connect=0, read=False, backoff_factor=1.5, status_forcelist=[429, 502, 503, 504]),
+))
+_session.hooks["response"].append(_throttle)
+
+def _update_congestion(overloaded, base_delay):
+    global _congestion_delay
+    with _rate_lock:
+        if overloaded:
+            _congestion_delay = min(60.0, max(base_delay, _congestion_delay * 1.5))
+        else:
+            _congestion_delay *= 0.5
+
+def retry_api_call(callable_fn, retries=5, base_delay=1.0, on_timeout_msg=None):
+    # Exponentielles Backoff mit Jitter; RetryError = 429/5xx trotz Adapter-Retries -> Überlast
     for i in range(retries):
         try:
-            return callable_fn()
-        except ReadTimeout:
+            result = callable_fn()
+        except (ReadTimeout, RequestsConnectionError, RetryError) as e:
+            _update_congestion(isinstance(e, RetryError), base_delay)
+            if i == retries - 1:
+                raise
+            delay = min(60.0, base_delay * 2 ** i + random.uniform(0, base_delay))
             if LOG_LEVEL >= 1:
-                print(f"{on_timeout_msg or 'Timeout'} – Warte {delay}s... (Versuch {i+1}/{retries})")
+                print(f"{on_timeout_msg or type(e).__name__} – Warte {delay:.1f}s... (Versuch {i+1}/{retries})")
             time.sleep(delay)
-    raise ReadTimeout("API-Anfrage mehrfach fehlgeschlagen.")
+        else:
+            _update_congestion(False, base_delay)
+            return result
 
 # =========================
 # Namen normalisieren
 # =========================
+# Anführungszeichen, Apostrophe, Satzzeichen, Bindestriche und Zero-Width-Zeichen in einem Durchgang
+_TRANS = str.maketrans({
+    "„": " ", "“": " ", "”": " ", '"': " ",
+    "’": "'", "´": "'",
+    ".": " ", ",": " ", ";": " ", ":": " ", "(": " ", ")": " ",
+    "-": " ",
+    "\u200b": None, "\u200c": None, "\u200d": None,
+})
+_SUFFIX_RE = re.compile(r"\b(jr|sr|ii|iii|iv|v)\b")
+_WS_RE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=8192)
 def _normalize_name(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = s.replace("„", " ").replace("“", " ").replace("”", " ").replace("’", "'").replace("´", "'")
-    s = s.replace('"', " ")
-    s = re.sub(r"[.,;:()]", " ", s)
-    s = s.replace("-", " ")
-    s = re.sub(r"[\u200b\u200c\u200d]", "", s)
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"\b(jr|sr|ii|iii|iv|v)\b", "", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = (s or "").strip().lower().translate(_TRANS)
+    s = _SUFFIX_RE.sub("", s)
+    return _WS_RE.sub(" ", s).strip()
+
+def _fold_accents(s: str) -> str:
+    # "bogdanović" -> "bogdanovic", damit Schreibweisen mit/ohne Akzent in derselben Shortlist landen
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
 
 _ALL_PLAYERS = static_players.get_players()
-_name_index = {}
+_name_index = defaultdict(list)
 for p in _ALL_PLAYERS:
-    norm = _normalize_name(p["full_name"])
-    _name_index.setdefault(norm, []).append(p)
+    _name_index[_normalize_name(p["full_name"])].append(p)
+_name_index = dict(_name_index)  # danach nur noch gelesen
+_name_keys = tuple(_name_index)
+_last_token_keys = defaultdict(list)  # letzter Namensteil ohne Akzente -> normalisierte Schlüssel, Shortlist für Fuzzy-Suche
+for norm in _name_keys:
+    _last_token_keys[_fold_accents(norm.rsplit(" ", 1)[-1])].append(norm)
+_last_token_keys = dict(_last_token_keys)
 
 ALIAS_OVERRIDES = {
     "vj edgecomb": "vj edgecombe",
@@ -110,6 +210,7 @@ ALIAS_OVERRIDES = {
 
 MANUAL_PLAYER_IDS = {}
 
+@functools.lru_cache(maxsize=16384)
 def resolve_player_id(name: str):
     norm = _normalize_name(name)
     if norm in ALIAS_OVERRIDES:
@@ -122,9 +223,15 @@ def resolve_player_id(name: str):
         active = [c for c in candidates if c.get("is_active")]
         pick = active[0] if active else candidates[0]
         return pick["id"], pick["full_name"]
-    close = get_close_matches(norm, list(_name_index.keys()), n=1, cutoff=0.82)
-    if close:
-        candidates = _name_index[close[0]]
+    # Shortlist (gleicher Nachname) liefert schnell eine Untergrenze; der volle Scan sucht dann
+    # nur noch mindestens gleich gute Treffer -> Ergebnis wie ein voller Scan, aber mit höherem Cutoff
+    # (-1, weil extractOne einen Treffer genau auf dem Cutoff verwerfen kann; der beste bleibt >= 82)
+    tokens = norm.split()
+    shortlist = _last_token_keys.get(_fold_accents(tokens[-1]), ()) if tokens else ()
+    best = process.extractOne(norm, shortlist, scorer=fuzz.ratio, score_cutoff=82)
+    match = process.extractOne(norm, _name_keys, scorer=fuzz.ratio, score_cutoff=best[1] - 1 if best else 82)
+    if match:
+        candidates = _name_index[match[0]]
         active = [c for c in candidates if c.get("is_active")]
         pick = active[0] if active else candidates[0]
         log_info(f"[Hinweis] '{name}' -> '{pick['full_name']}'")
@@ -132,11 +239,22 @@ def resolve_player_id(name: str):
     log_warn(f"[Warnung] Spieler nicht gefunden: {name}")
     return None, None
 
-current_team_cache = {}
+def load_team_map():
+    # Ein Aufruf für alle Spieler statt CommonPlayerInfo je Spieler; leeres Team = vereinslos
+    try:
+        resp = retry_api_call(lambda: commonallplayers.CommonAllPlayers(is_only_current_season=1, season=SEASON))
+        all_df = resp.get_data_frames()[0]
+    except Exception as e:
+        log_warn(f"[Warnung] Teamliste nicht abrufbar, frage Teams einzeln ab: {e}")
+        return {}
+    teams = all_df["TEAM_ABBREVIATION"].fillna("").astype(str).str.strip()
+    return dict(zip(all_df["PERSON_ID"].astype(int), teams))
 
 def get_current_team_abbrev(player_id, spiele_df=None):
-    if player_id in current_team_cache:
-        return current_team_cache[player_id]
+    team_abbr = team_by_pid.get(int(player_id))
+    if team_abbr is not None:
+        return team_abbr or "FA"
+    # nicht in der Teamliste (oder Liste nicht abrufbar): Einzelabfrage wie bisher
     team_abbr = ""
     try:
         info = retry_api_call(lambda: commonplayerinfo.CommonPlayerInfo(player_id=player_id))
@@ -145,21 +263,38 @@ def get_current_team_abbrev(player_id, spiele_df=None):
             team_abbr = str(info_df.at[0, "TEAM_ABBREVIATION"]).strip()
     except Exception:
         team_abbr = ""
+    # letzter Ausweg: eigenes Team aus dem jüngsten Spiel ("LAL vs. BOS" / "LAL @ BOS")
     if not team_abbr and spiele_df is not None and not spiele_df.empty:
-        if "TEAM_ABBREVIATION" in spiele_df.columns:
-            team_abbr = str(spiele_df.iloc[0]["TEAM_ABBREVIATION"]).strip()
-    team_abbr = team_abbr or "FA"
-    current_team_cache[player_id] = team_abbr
-    return team_abbr
-
-def count_milestones(spiele: pd.DataFrame, thresholds: dict) -> dict:
-    counts = {}
-    for metric, limits in thresholds.items():
-        serie = spiele.get("STL", 0) + spiele.get("BLK", 0) if metric == "STL+BLK" else spiele.get(metric, 0)
-        if not isinstance(serie, pd.Series):
-            serie = pd.Series([0]*len(spiele))
-        counts[metric] = {f"{limit}+": int((serie >= limit).sum()) for limit in limits}
-    return counts
+        if "MATCHUP" in spiele_df.columns:
+            team_abbr = str(spiele_df.iloc[0]["MATCHUP"]).split(" ", 1)[0].strip()
+    return team_abbr or "FA"
+
+# Metrik -> Spalte im PlayerGameLog (Ballverluste heißen dort TOV; FG2M und STL+BLK werden abgeleitet)
+GAMELOG_COLUMNS = {"PTS":"PTS","REB":"REB","AST":"AST","STL":"STL","BLK":"BLK","FG3M":"FG3M","FTM":"FTM","TO":"TOV"}
+
+def gamelog_matrix(spiele: pd.DataFrame) -> np.ndarray:
+    # eine int32-Matrix (Spiele x Metriken) in Reihenfolge von limit_labels; fehlende Spalten bleiben 0
+    werte = np.zeros((len(spiele), len(limit_labels)), dtype=np.int32)
+    for metric, col in GAMELOG_COLUMNS.items():
+        if col in spiele.columns:
+            werte[:, metric_index[metric]] = spiele[col].to_numpy(dtype=np.int32)
+    fgm = spiele["FGM"].to_numpy(dtype=np.int32) if "FGM" in spiele.columns else 0
+    werte[:, metric_index["FG2M"]] = np.maximum(fgm - werte[:, metric_index["FG3M"]], 0)
+    werte[:, metric_index["STL+BLK"]] = werte[:, metric_index["STL"]] + werte[:, metric_index["BLK"]]
+    return werte
+
+def count_milestones(werte: np.ndarray, last_n: int):
+    # alle Metriken in einem Vergleich: (Spiele, Metriken, 1) >= (1, Metriken, Grenzen)
+    # Gamelog ist absteigend sortiert: die ersten last_n Zeilen sind die letzten Spiele
+    # zusätzlich flach in Reihenfolge von milestone_order (für den Excel-Export per Index)
+    treffer = werte[:, :, None] >= limit_matrix[None, :, :]
+    last_arr = treffer[:last_n].sum(axis=0)
+    full_arr = treffer.sum(axis=0)
+    last, full = last_arr.tolist(), full_arr.tolist()
+    # zip() schneidet die aufgefüllten Grenzen ab
+    last_counts = {metric: dict(zip(keys, last[i])) for i, (metric, keys) in enumerate(limit_labels.items())}
+    full_counts = {metric: dict(zip(keys, full[i])) for i, (metric, keys) in enumerate(limit_labels.items())}
+    return last_counts, full_counts, last_arr[limit_mask].tolist(), full_arr[limit_mask].tolist()
 
 # =========================
 # Meilensteine
@@ -176,94 +311,132 @@ milestones = {
     "FTM": [2,4,6,8,10],
     "TO": [1,2,3,4,5]
 }
+# einmalig: fertige "N+"-Schlüssel je Metrik
+limit_labels = {metric: [f"{limit}+" for limit in limits] for metric, limits in milestones.items()}
+metric_index = {metric: i for i, metric in enumerate(limit_labels)}
+# Grenzen als Matrix (Metriken x max. Anzahl Grenzen), Lücken mit int32-Max -> nie ein Treffer
+limit_matrix = np.full((len(milestones), max(len(limits) for limits in milestones.values())), np.iinfo(np.int32).max, dtype=np.int32)
+for _i, _limits in enumerate(milestones.values()):
+    limit_matrix[_i, :len(_limits)] = _limits
+limit_mask = limit_matrix != np.iinfo(np.int32).max  # echte Grenzen, zeilenweise = milestone_order
+milestone_order = [(metric, limit) for metric, limits in milestones.items() for limit in limits]
 
 # =========================
 # Spieler einlesen
 # =========================
-spieler_df = pd.read_csv(input_datei, delimiter=";", quotechar='"')
+# nur die Spalte "Player" parsen (Header ggf. mit Leerzeichen)
+spieler_df = pd.read_csv(input_datei, delimiter=";", quotechar='"',
+                         usecols=lambda c: c.strip() == "Player", dtype=str, keep_default_na=False)
 spieler_df.columns = spieler_df.columns.str.strip()
 if "Player" not in spieler_df.columns:
     raise ValueError("In der CSV muss eine Spalte 'Player' stehen.")
-spieler_namen = spieler_df["Player"].astype(str).tolist()
+spieler_namen = list(dict.fromkeys(raw_name.strip() for raw_name in spieler_df["Player"]))
+
+# =========================
+# Namen vorab auflösen (reine CPU-Arbeit)
+# =========================
+to_fetch, not_found = [], []
+seen_ids = set()  # verschiedene Schreibweisen desselben Spielers nur einmal abrufen
+for name in spieler_namen:
+    if not name:
+        continue
+    spieler_id, resolved = resolve_player_id(name)
+    if not spieler_id:
+        not_found.append(name)
+    elif spieler_id not in seen_ids:
+        seen_ids.add(spieler_id)
+        to_fetch.append((name, spieler_id, resolved))
+
+if not_found:
+    with open(not_found_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["not_found"])
+        writer.writerows([n] for n in not_found)
 
 # =========================
 # Hauptlogik
 # =========================
-ergebnisse, spieler_cache, not_found = {}, {}, []
+ergebnisse = {}
+team_by_pid = load_team_map()
 
-for raw_name in spieler_namen:
-    name = raw_name.strip()
-    try:
-        spieler_id, resolved = resolve_player_id(name)
-        if not spieler_id:
-            not_found.append(name)
-            continue
-        spieler_cache[name] = spieler_id
-        gamelog = retry_api_call(lambda: playergamelog.PlayerGameLog(player_id=spieler_id, season=SEASON))
-        spiele = gamelog.get_data_frames()[0] if gamelog.get_data_frames() else pd.DataFrame()
-        if "TOV" in spiele.columns: spiele.rename(columns={"TOV": "TO"}, inplace=True)
-        for col in ["PTS","REB","AST","STL","BLK","FG3M","TO","FGM","FGA","FG3A","FTM","FTA","TEAM_ABBREVIATION"]:
-            if col not in spiele.columns: spiele[col] = 0
-        spiele["FG2M"] = (spiele["FGM"] - spiele["FG3M"]).clip(lower=0)
-        team_abbr = get_current_team_abbrev(spieler_id, spiele_df=spiele)
-        letzte_n, saison = spiele.head(LAST_N), spiele
-        last_counts = count_milestones(letzte_n.copy(), milestones)
-        full_counts = count_milestones(saison.copy(), milestones)
-        ergebnisse.setdefault(team_abbr, []).append({
-            "Player": resolved,
-            "Last N Games": last_counts,
-            "Full Season": full_counts,
-            "Games Played": int(len(saison))
-        })
-        time.sleep(SLEEP_BETWEEN_CALLS)
-    except Exception as e:
-        log_error(f"Fehler bei {name}: {e}")
+def fetch_player(spieler_id, resolved):
+    gamelog = retry_api_call(lambda: playergamelog.PlayerGameLog(player_id=spieler_id, season=SEASON))
+    frames = gamelog.get_data_frames()
+    spiele = frames[0] if frames else pd.DataFrame()
+    werte = gamelog_matrix(spiele)
+    team_abbr = get_current_team_abbrev(spieler_id, spiele_df=spiele)
+    last_counts, full_counts, last_flat, full_flat = count_milestones(werte, LAST_N)
+    return team_abbr, {
+        "Player": resolved,
+        "Last N Games": last_counts,
+        "Full Season": full_counts,
+        "Games Played": int(len(spiele)),
+        "Last N Flat": last_flat,
+        "Full Flat": full_flat,
+    }
 
-if not_found:
-    pd.DataFrame({"not_found": not_found}).to_csv(not_found_csv, index=False)
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+    futures = [pool.submit(fetch_player, spieler_id, resolved) for _, spieler_id, resolved in to_fetch]
+    # in CSV-Reihenfolge einsammeln, damit die Sheets stabil bleiben
+    for (name, _, _), future in zip(to_fetch, futures):
+        try:
+            team_abbr, eintrag = future.result()
+        except Exception as e:
+            log_error(f"Fehler bei {name}: {e}")
+            continue
+        ergebnisse.setdefault(team_abbr, []).append(eintrag)
 
 # =========================
 # Excel-Export
 # =========================
-wb = Workbook()
-wb.remove(wb.active)
-LIGHT_GREEN  = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-STRONG_GREEN = PatternFill(start_color="99FF99", end_color="99FF99", fill_type="solid")
-
-for team, stats in ergebnisse.items():
-    ws = wb.create_sheet(title=(team or "FA")[:31])
-    header = ["Milestones"]
-    for s in stats:
-        header += [s["Player"], f"__helper_{s['Player']}"]
-    ws.append(header)
-    n_players = len(stats)
-    for cat, limits in milestones.items():
-        for limit in limits:
-            label = f"{cat} {limit}+"
-            row, helpers = [label], []
+if EMIT_XLSX:
+    wb = Workbook(write_only=True)
+    LIGHT_GREEN  = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
+    STRONG_GREEN = PatternFill(start_color="99FF99", end_color="99FF99", fill_type="solid")
+    n_rows = 1 + len(milestone_order)
+    row_labels = [f"{cat} {limit}+" for cat, limit in milestone_order]
+
+    def _pct_cell(ws, anzahl, anteil):
+        # Wert = Anteil (0..1), die Trefferzahl steht als Text im Zahlenformat -> "6 (75.00%)"
+        # nur die Anzahl variiert im Format, damit bleibt die Zahl der Formate klein
+        cell = WriteOnlyCell(ws, value=anteil)
+        cell.number_format = f'"{anzahl} ("0.00%")"'
+        return cell
+
+    for team, stats in ergebnisse.items():
+        ws = wb.create_sheet(title=(team or "FA")[:31])
+        n_players = len(stats)
+        row_len = 1 + 2*n_players
+        header = [None] * row_len
+        header[0] = "Milestones"
+        for j, s in enumerate(stats):
+            header[1+2*j] = f"{s['Player']} (letzte {LAST_N})"
+            header[2+2*j] = f"{s['Player']} (Saison)"
+        ws.append(header)
+        for k, label in enumerate(row_labels):
+            row = [None] * row_len
+            row[0] = label
             for j, s in enumerate(stats):
-                last_v = s["Last N Games"].get(cat, {}).get(f"{limit}+", 0)
-                last_p = (last_v / LAST_N * 100) if LAST_N > 0 else 0
-                full_v = s["Full Season"].get(cat, {}).get(f"{limit}+", 0)
+                last_v = s["Last N Flat"][k]
+                full_v = s["Full Flat"][k]
                 gp = s["Games Played"]
-                full_p = (full_v / gp * 100) if gp > 0 else 0
-                row += [f"{last_v} ({last_p:.2f}%) / {full_v} ({full_p:.2f}%)", None]
-                helpers.append((3+2*j, full_p/100))
+                row[1+2*j] = _pct_cell(ws, last_v, last_v / LAST_N if LAST_N > 0 else 0)
+                row[2+2*j] = _pct_cell(ws, full_v, full_v / gp if gp > 0 else 0)
             ws.append(row)
-            r = ws.max_row
-            for c, v in helpers: ws.cell(row=r, column=c, value=v)
-    for j in range(n_players):
-        ws.column_dimensions[get_column_letter(3+2*j)].hidden = True
-        vis = get_column_letter(2+2*j)
-        helper = get_column_letter(3+2*j)
-        rng = f"{vis}2:{vis}{ws.max_row}"
-        rule1 = FormulaRule(formula=[f"=${helper}2>=1"], fill=STRONG_GREEN)
-        rule2 = FormulaRule(formula=[f"=AND(${helper}2>=0.85,${helper}2<1)"], fill=LIGHT_GREEN)
-        ws.conditional_formatting.add(rng, rule1)
-        ws.conditional_formatting.add(rng, rule2)
-
-wb.save(output_xlsx)
-print(f"✅ Excel gespeichert: {output_xlsx}")
+        for j in range(n_players):
+            last_col = get_column_letter(2+2*j)
+            full_col = get_column_letter(3+2*j)
+            # beide Zellen des Spielers einfärben, Maßstab ist die Saison-Quote
+            rng = f"{last_col}2:{full_col}{n_rows}"
+            rule1 = FormulaRule(formula=[f"=${full_col}2>=1"], fill=STRONG_GREEN)
+            rule2 = FormulaRule(formula=[f"=AND(${full_col}2>=0.85,${full_col}2<1)"], fill=LIGHT_GREEN)
+            ws.conditional_formatting.add(rng, rule1)
+            ws.conditional_formatting.add(rng, rule2)
+
+    wb.save(output_xlsx)
+    print(f"✅ Excel gespeichert: {output_xlsx}")
+else:
+    print("⏭️ Excel übersprungen (--xlsx zum Erzwingen)")
 
 # =========================
 # JSON-Export für Web
@@ -275,6 +448,10 @@ json_payload = {
     for t, stats in ergebnisse.items()
 }
 json_path = os.path.join(BASE_DIR, "public", "data", "milestones.json")
-with open(json_path, "w", encoding="utf-8") as f:
-    json.dump(json_payload, f, ensure_ascii=False)
+if orjson is not None:
+    with open(json_path, "wb") as f:
+        f.write(orjson.dumps(json_payload, option=orjson.OPT_NON_STR_KEYS))
+else:
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(json_payload, f, ensure_ascii=False)
 print(f"🌐 JSON geschrieben -> {json_path}")
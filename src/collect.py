@@ -1,16 +1,34 @@
 # src/collect.py
 import os
 import re
+import csv
 import time
 import json
+import random
+import functools
+import unicodedata
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-from difflib import get_close_matches
-from requests.exceptions import ReadTimeout
+import requests_cache
+from rapidfuzz import process, fuzz
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, ReadTimeout, RetryError
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # Fallback auf die Standardbibliothek
+    orjson = None
 
 from nba_api.stats.static import players as static_players
-from nba_api.stats.endpoints import playergamelog, commonplayerinfo
+from nba_api.stats.endpoints import playergamelog, commonplayerinfo, commonallplayers
+from nba_api.stats.library.http import NBAStatsHTTP
 
 # =====================================
 # Basis-Pfade (repo-relativ)
@@ -22,13 +40,15 @@ NOT_FOUND_CSV = BASE_DIR / "not_found_names.csv"
 PUBLIC_DATA_DIR = BASE_DIR / "public" / "data"
 PUBLIC_DATA_DIR.mkdir(parents=True, exist_ok=True)
 PUBLIC_JSON = PUBLIC_DATA_DIR / "milestones.json"
+HTTP_CACHE = BASE_DIR / "nba_cache"  # sqlite, wird als nba_cache.sqlite angelegt
 
 # =====================================
 # Parameter
 # =====================================
 SEASON = "2025-26"
 LAST_N = 8
-SLEEP_BETWEEN_CALLS = 0.1
+MAX_WORKERS = 6
+REQUESTS_PER_SECOND = 4  # gilt für alle Worker zusammen
 LOG_LEVEL = 0  # 0 quiet, 1 warn, 2 info
 
 
@@ -42,42 +62,129 @@ def log_warn(msg: str):
         print(msg)
 
 
-def retry_api_call(callable_fn, retries=3, delay=5, on_timeout_msg=None):
+# =====================================
+# HTTP-Cache + Rate-Limit
+# =====================================
+# Gamelogs wachsen nur an, Team-Infos ändern sich nur bei Trades
+requests_cache.install_cache(
+    str(HTTP_CACHE),
+    backend="sqlite",
+    expire_after=timedelta(hours=1),
+    urls_expire_after={
+        "stats.nba.com/stats/playergamelog": timedelta(hours=6),
+        "stats.nba.com/stats/commonplayerinfo": timedelta(days=1),
+        "stats.nba.com/stats/commonallplayers": timedelta(days=1),
+    },
+)
+
+_rate_lock = threading.Lock()
+_next_call_at = 0.0
+_congestion_delay = 0.0  # globaler Zuschlag je Anfrage: wächst bei Überlast, klingt bei Erfolg ab
+
+
+def _throttle(response, *args, **kwargs):
+    # Token-Bucket mit Größe 1 über alle Threads; Cache-Treffer zählen nicht.
+    # requests-cache ruft Response-Hooks bei echten Anfragen zweimal auf -> nur einmal zählen
+    global _next_call_at
+    if getattr(response, "from_cache", False) or getattr(response, "_throttled", False):
+        return response
+    response._throttled = True
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_call_at - now
+        _next_call_at = max(now, _next_call_at) + 1.0 / REQUESTS_PER_SECOND + _congestion_delay
+    if wait > 0:
+        time.sleep(wait)
+    return response
+
+
+# eine gemeinsame Session für alle Endpoints: Keep-Alive, Pool für alle Worker, Retry bei 429/5xx
+# nur Status-Retries im Adapter: Timeouts/Verbindungsfehler gehen direkt an retry_api_call
+# (read=False -> ReadTimeout statt ConnectionError, sonst multiplizieren sich beide Retry-Ebenen)
+_session = NBAStatsHTTP.get_session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, connect=0, read=False, backoff_factor=1.5, status_forcelist=[429, 502, 503, 504]),
+))
+_session.hooks["response"].append(_throttle)
+
+
+def _update_congestion(overloaded: bool, base_delay: float):
+    global _congestion_delay
+    with _rate_lock:
+        if overloaded:
+            _congestion_delay = min(60.0, max(base_delay, _congestion_delay * 1.5))
+        else:
+            _congestion_delay *= 0.5
+
+
+def retry_api_call(callable_fn, retries=5, base_delay=1.0, on_timeout_msg=None):
+    # Exponentielles Backoff mit Jitter; RetryError = 429/5xx trotz Adapter-Retries -> Überlast
     for i in range(retries):
         try:
-            return callable_fn()
-        except ReadTimeout:
+            result = callable_fn()
+        except (ReadTimeout, RequestsConnectionError, RetryError) as e:
+            _update_congestion(isinstance(e, RetryError), base_delay)
+            if i == retries - 1:
+                raise
+            delay = min(60.0, base_delay * 2 ** i + random.uniform(0, base_delay))
             if LOG_LEVEL >= 1:
-                print(f"{on_timeout_msg or 'Timeout'} ({i+1}/{retries}) – warte {delay}s …")
+                print(f"{on_timeout_msg or type(e).__name__} ({i+1}/{retries}) – warte {delay:.1f}s …")
             time.sleep(delay)
-    raise ReadTimeout("API mehrfach fehlgeschlagen")
+        else:
+            _update_congestion(False, base_delay)
+            return result
 
 
 # =====================================
 # Namen normalisieren
 # =====================================
+# Anführungszeichen, Apostrophe, Satzzeichen und Bindestriche in einem Durchgang
+_TRANS = str.maketrans({
+    "„": " ", "“": " ", "”": " ", '"': " ",
+    "’": "'", "´": "'",
+    ".": " ", ",": " ", ";": " ", ":": " ", "(": " ", ")": " ",
+    "-": " ",
+})
+_SUFFIX_RE = re.compile(r"\b(jr|sr|ii|iii|iv|v)\b")
+_WS_RE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=8192)
 def _normalize_name(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = s.replace("„", " ").replace("“", " ").replace("”", " ")
-    s = s.replace("’", "'").replace("´", "'").replace('"', " ")
-    s = re.sub(r"[.,;:()]", " ", s)
-    s = s.replace("-", " ")
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"\b(jr|sr|ii|iii|iv|v)\b", "", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = (s or "").strip().lower().translate(_TRANS)
+    s = _SUFFIX_RE.sub("", s)
+    return _WS_RE.sub(" ", s).strip()
+
+
+def _fold_accents(s: str) -> str:
+    # "bogdanović" -> "bogdanovic", damit Schreibweisen mit/ohne Akzent in derselben Shortlist landen
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
 
 
 ALL_PLAYERS = static_players.get_players()
-NAME_INDEX = {}
+NAME_INDEX = defaultdict(list)
+LAST_NAME_INDEX = defaultdict(list)  # Nachname -> Spieler, nur für mehrteilige Namen
 for p in ALL_PLAYERS:
     norm = _normalize_name(p["full_name"])
-    NAME_INDEX.setdefault(norm, []).append(p)
+    NAME_INDEX[norm].append(p)
+    if " " in norm:
+        LAST_NAME_INDEX[norm.rsplit(" ", 1)[-1]].append(p)
+# danach nur noch gelesen: zurück zu dict, damit .get/[] keine leeren Einträge anlegt
+NAME_INDEX = dict(NAME_INDEX)
+LAST_NAME_INDEX = dict(LAST_NAME_INDEX)
+NAME_KEYS = tuple(NAME_INDEX)
+LAST_TOKEN_KEYS = defaultdict(list)  # letzter Namensteil ohne Akzente -> normalisierte Schlüssel, Shortlist für Fuzzy-Suche
+for norm in NAME_KEYS:
+    LAST_TOKEN_KEYS[_fold_accents(norm.rsplit(" ", 1)[-1])].append(norm)
+LAST_TOKEN_KEYS = dict(LAST_TOKEN_KEYS)
 
 ALIAS_OVERRIDES = {
     "vj edgecomb": "vj edgecombe",
     "valdez drexel v j edgecombe": "vj edgecombe",
     "hood schifino": "jalen hood schifino",
+    "hood schifino jalen": "jalen hood schifino",
     "hood-schifino jalen": "jalen hood schifino",
     "dariq miller whitehead": "dariq whitehead",
     "dariq miller-whitehead": "dariq whitehead",
@@ -90,6 +197,7 @@ MANUAL_PLAYER_IDS = {
 }
 
 
+@functools.lru_cache(maxsize=16384)
 def resolve_player_id(name: str):
     norm = _normalize_name(name)
 
@@ -112,17 +220,21 @@ def resolve_player_id(name: str):
         pick = active[0] if active else candidates[0]
         return pick["id"], pick["full_name"]
 
-    close = get_close_matches(norm, list(NAME_INDEX.keys()), n=1, cutoff=0.82)
-    if close:
-        candidates = NAME_INDEX[close[0]]
+    # Shortlist (gleicher Nachname) liefert schnell eine Untergrenze; der volle Scan sucht dann
+    # nur noch mindestens gleich gute Treffer -> Ergebnis wie ein voller Scan, aber mit höherem Cutoff
+    # (-1, weil extractOne einen Treffer genau auf dem Cutoff verwerfen kann; der beste bleibt >= 82)
+    tokens = norm.split()
+    shortlist = LAST_TOKEN_KEYS.get(_fold_accents(tokens[-1]), ()) if tokens else ()
+    best = process.extractOne(norm, shortlist, scorer=fuzz.ratio, score_cutoff=82)
+    match = process.extractOne(norm, NAME_KEYS, scorer=fuzz.ratio, score_cutoff=best[1] - 1 if best else 82)
+    if match:
+        candidates = NAME_INDEX[match[0]]
         active = [c for c in candidates if c.get("is_active")]
         pick = active[0] if active else candidates[0]
         return pick["id"], pick["full_name"]
 
-    tokens = norm.split()
     if tokens:
-        last = tokens[-1]
-        pool = [p for p in ALL_PLAYERS if _normalize_name(p["full_name"]).endswith(" " + last)]
+        pool = LAST_NAME_INDEX.get(tokens[-1], [])
         if pool:
             active = [c for c in pool if c.get("is_active")]
             pick = active[0] if active else pool[0]
@@ -132,10 +244,26 @@ def resolve_player_id(name: str):
     return None, None
 
 
-def get_current_team_abbrev(player_id, spiele_df=None, cache: dict = None):
-    if cache is not None and player_id in cache:
-        return cache[player_id]
+# Aktuelle Teams aller Spieler mit einem einzigen Aufruf (statt CommonPlayerInfo je Spieler)
+# leeres Team = vereinslos; fehlt die Liste ganz, fragt get_current_team_abbrev einzeln ab
+def load_team_map() -> dict:
+    try:
+        resp = retry_api_call(lambda: commonallplayers.CommonAllPlayers(is_only_current_season=1, season=SEASON))
+        all_df = resp.get_data_frames()[0]
+    except Exception as e:
+        log_warn(f"[Warnung] Teamliste nicht abrufbar, frage Teams einzeln ab: {e}")
+        return {}
+
+    teams = all_df["TEAM_ABBREVIATION"].fillna("").astype(str).str.strip()
+    return dict(zip(all_df["PERSON_ID"].astype(int), teams))
+
 
+def get_current_team_abbrev(player_id, spiele_df=None):
+    team_abbr = TEAM_BY_PID.get(int(player_id))
+    if team_abbr is not None:
+        return team_abbr or "FA"
+
+    # nicht in der Teamliste (oder Liste nicht abrufbar): Einzelabfrage wie bisher
     team_abbr = ""
     try:
         info = retry_api_call(lambda: commonplayerinfo.CommonPlayerInfo(player_id=player_id))
@@ -145,29 +273,44 @@ def get_current_team_abbrev(player_id, spiele_df=None, cache: dict = None):
     except Exception:
         pass
 
+    # letzter Ausweg: eigenes Team aus dem jüngsten Spiel ("LAL vs. BOS" / "LAL @ BOS")
     if (not team_abbr) and spiele_df is not None and not spiele_df.empty:
-        if "TEAM_ABBREVIATION" in spiele_df.columns:
-            team_abbr = str(spiele_df.iloc[0]["TEAM_ABBREVIATION"]).strip()
+        if "MATCHUP" in spiele_df.columns:
+            team_abbr = str(spiele_df.iloc[0]["MATCHUP"]).split(" ", 1)[0].strip()
 
-    if not team_abbr:
-        team_abbr = "FA"
+    return team_abbr or "FA"
 
-    if cache is not None:
-        cache[player_id] = team_abbr
-    return team_abbr
 
+# Metrik -> Spalte im PlayerGameLog (Ballverluste heißen dort TOV; FG2M und STL+BLK werden abgeleitet)
+GAMELOG_COLUMNS = {
+    "PTS": "PTS", "REB": "REB", "AST": "AST", "STL": "STL", "BLK": "BLK",
+    "FG3M": "FG3M", "FTM": "FTM", "TO": "TOV",
+}
 
-def count_milestones(spiele: pd.DataFrame, thresholds: dict) -> dict:
-    counts = {}
-    for metric, limits in thresholds.items():
-        if metric == "STL+BLK":
-            serie = spiele.get("STL", 0) + spiele.get("BLK", 0)
-        else:
-            serie = spiele.get(metric, 0)
-        if not isinstance(serie, pd.Series):
-            serie = pd.Series([0] * len(spiele))
-        counts[metric] = {f"{limit}+": int((serie >= limit).sum()) for limit in limits}
-    return counts
+
+def gamelog_matrix(spiele: pd.DataFrame) -> np.ndarray:
+    # eine int32-Matrix (Spiele x Metriken) in Reihenfolge von LIMIT_LABELS; fehlende Spalten bleiben 0
+    werte = np.zeros((len(spiele), len(LIMIT_LABELS)), dtype=np.int32)
+    for metric, col in GAMELOG_COLUMNS.items():
+        if col in spiele.columns:
+            werte[:, METRIC_INDEX[metric]] = spiele[col].to_numpy(dtype=np.int32)
+
+    fgm = spiele["FGM"].to_numpy(dtype=np.int32) if "FGM" in spiele.columns else 0
+    werte[:, METRIC_INDEX["FG2M"]] = np.maximum(fgm - werte[:, METRIC_INDEX["FG3M"]], 0)
+    werte[:, METRIC_INDEX["STL+BLK"]] = werte[:, METRIC_INDEX["STL"]] + werte[:, METRIC_INDEX["BLK"]]
+    return werte
+
+
+def count_milestones(werte: np.ndarray, last_n: int):
+    # alle Metriken in einem Vergleich: (Spiele, Metriken, 1) >= (1, Metriken, Grenzen)
+    # Gamelog ist absteigend sortiert: die ersten last_n Zeilen sind die letzten Spiele
+    treffer = werte[:, :, None] >= LIMIT_MATRIX[None, :, :]
+    last = treffer[:last_n].sum(axis=0).tolist()
+    full = treffer.sum(axis=0).tolist()
+    # zip() schneidet die aufgefüllten Grenzen ab
+    last_counts = {metric: dict(zip(keys, last[i])) for i, (metric, keys) in enumerate(LIMIT_LABELS.items())}
+    full_counts = {metric: dict(zip(keys, full[i])) for i, (metric, keys) in enumerate(LIMIT_LABELS.items())}
+    return last_counts, full_counts
 
 
 MILESTONES = {
@@ -183,71 +326,91 @@ MILESTONES = {
     "TO": [1, 2, 3, 4, 5],
 }
 
+# einmalig: fertige "N+"-Schlüssel je Metrik
+LIMIT_LABELS = {metric: [f"{limit}+" for limit in limits] for metric, limits in MILESTONES.items()}
+METRIC_INDEX = {metric: i for i, metric in enumerate(LIMIT_LABELS)}
+# Grenzen als Matrix (Metriken x max. Anzahl Grenzen), Lücken mit int32-Max -> nie ein Treffer
+LIMIT_MATRIX = np.full(
+    (len(MILESTONES), max(len(limits) for limits in MILESTONES.values())),
+    np.iinfo(np.int32).max,
+    dtype=np.int32,
+)
+for _i, _limits in enumerate(MILESTONES.values()):
+    LIMIT_MATRIX[_i, :len(_limits)] = _limits
+
 # =====================================
 # 1) PlayerNames.csv einlesen
 # =====================================
 if INPUT_CSV.exists():
-    spieler_df = pd.read_csv(INPUT_CSV, delimiter=";", quotechar='"')
+    # nur die Spalte "Player" parsen (Header ggf. mit Leerzeichen)
+    spieler_df = pd.read_csv(INPUT_CSV, delimiter=";", quotechar='"',
+                             usecols=lambda c: c.strip() == "Player", dtype=str, keep_default_na=False)
     spieler_df.columns = spieler_df.columns.str.strip()
-    namen = spieler_df["Player"].astype(str).tolist()
+    namen = list(dict.fromkeys(raw_name.strip() for raw_name in spieler_df["Player"]))
 else:
     # Fallback: alle aktiven Spieler
     namen = [p["full_name"] for p in ALL_PLAYERS if p.get("is_active")]
     pd.DataFrame({"Player": namen}).to_csv(INPUT_CSV, sep=";", index=False)
 
-ergebnisse = {}
+# =====================================
+# 2) Alle Namen vorab auflösen (reine CPU-Arbeit)
+# =====================================
+to_fetch = []
 not_found = []
-team_cache = {}
-spieler_cache = {}
-
-for raw_name in namen:
-    name = raw_name.strip()
-    try:
-        if name in spieler_cache:
-            player_id = spieler_cache[name]
-            resolved_name = name
-        else:
-            player_id, resolved_name = resolve_player_id(name)
-            if not player_id:
-                not_found.append(name)
-                continue
-            spieler_cache[name] = player_id
-
-        gamelog = retry_api_call(lambda: playergamelog.PlayerGameLog(player_id=player_id, season=SEASON))
-        frames = gamelog.get_data_frames()
-        spiele = frames[0] if frames else pd.DataFrame()
+seen_ids = set()  # verschiedene Schreibweisen desselben Spielers nur einmal abrufen
+for name in namen:
+    if not name:
+        continue
+    player_id, resolved_name = resolve_player_id(name)
+    if not player_id:
+        not_found.append(name)
+    elif player_id not in seen_ids:
+        seen_ids.add(player_id)
+        to_fetch.append((name, player_id, resolved_name))
 
-        if "TOV" in spiele.columns and "TO" not in spiele.columns:
-            spiele.rename(columns={"TOV": "TO"}, inplace=True)
+if not_found:
+    # eine Spalte braucht keinen DataFrame; csv quotet Namen mit Komma/Anführungszeichen
+    with open(NOT_FOUND_CSV, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["not_found"])
+        writer.writerows([n] for n in not_found)
 
-        for col in ["PTS", "REB", "AST", "STL", "BLK", "FG3M", "TO", "FGM", "FTM"]:
-            if col not in spiele.columns:
-                spiele[col] = 0
+# =====================================
+# 3) Gamelogs + Teams abrufen
+# =====================================
+ergebnisse = {}
+TEAM_BY_PID = load_team_map()
 
-        spiele["FG2M"] = (spiele["FGM"] - spiele["FG3M"]).clip(lower=0)
 
-        team_abbr = get_current_team_abbrev(player_id, spiele_df=spiele, cache=team_cache)
+def fetch_player(player_id, resolved_name: str):
+    gamelog = retry_api_call(lambda: playergamelog.PlayerGameLog(player_id=player_id, season=SEASON))
+    frames = gamelog.get_data_frames()
+    spiele = frames[0] if frames else pd.DataFrame()
 
-        last_n = spiele.head(LAST_N)
-        full_season = spiele
+    werte = gamelog_matrix(spiele)
 
-        last_n_counts = count_milestones(last_n, MILESTONES)
-        full_counts = count_milestones(full_season, MILESTONES)
+    team_abbr = get_current_team_abbrev(player_id, spiele_df=spiele)
 
-        ergebnisse.setdefault(team_abbr, []).append({
-            "Player": resolved_name,
-            "Last N Games": last_n_counts,
-            "Full Season": full_counts,
-            "Games Played": int(len(full_season)),
-        })
+    last_n_counts, full_counts = count_milestones(werte, LAST_N)
 
-        time.sleep(SLEEP_BETWEEN_CALLS)
+    return team_abbr, {
+        "Player": resolved_name,
+        "Last N Games": last_n_counts,
+        "Full Season": full_counts,
+        "Games Played": int(len(spiele)),
+    }
 
-    except Exception as e:
-        log_warn(f"Fehler bei {name}: {e}")
 
-if not_found:
-    pd.DataFrame({"not_found": not_found}).to_csv(NOT_FOUND_CSV, index=False)
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+    futures = [pool.submit(fetch_player, player_id, resolved_name) for _, player_id, resolved_name in to_fetch]
+    # in CSV-Reihenfolge einsammeln, damit die Ausgabe stabil bleibt
+    for (name, _, _), future in zip(to_fetch, futures):
+        try:
+            team_abbr, eintrag = future.result()
+        except Exception as e:
+            log_warn(f"Fehler bei {name}: {e}")
+            continue
+        ergebnisse.setdefault(team_abbr, []).append(eintrag)
 
 # =====================================
 # JSON bauen
@@ -273,7 +436,10 @@ if running_in_ci and (not json_payload) and PUBLIC_JSON.exists():
         old = json.load(f)
     json_payload = old
 
-with open(PUBLIC_JSON, "w", encoding="utf-8") as f:
-    json.dump(json_payload, f, ensure_ascii=False)
+if orjson is not None:
+    PUBLIC_JSON.write_bytes(orjson.dumps(json_payload, option=orjson.OPT_NON_STR_KEYS))
+else:
+    with open(PUBLIC_JSON, "w", encoding="utf-8") as f:
+        json.dump(json_payload, f, ensure_ascii=False)
 
 print("JSON geschrieben nach", PUBLIC_JSON)